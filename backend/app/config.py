@@ -1,5 +1,6 @@
 """Application configuration using pydantic-settings."""
 
+from functools import cached_property
 from pydantic_settings import BaseSettings
 from pathlib import Path
 
@@ -17,13 +18,23 @@ class Settings(BaseSettings):
     # Chunking
     MAX_CHUNK_LINES: int = 200
     FALLBACK_CHUNK_LINES: int = 150
+    CHUNK_WORKERS: int = 0               # 0 → os.cpu_count()
+    PARALLEL_CHUNK_MIN_FILES: int = 50   # below this, chunk in-process
 
     # Embedding
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_BACKEND: str = "torch"     # "torch" or "onnx-int8" (needs optimum[onnxruntime])
+    EMBEDDING_CACHE_DIR: str = "./models"
 
     # Retrieval
     DEFAULT_TOP_K: int = 20
+    VECTOR_SEARCH_KERNEL: str = "numpy"  # "numpy" or "numba" (fused parallel top-k, needs numba)
+    VECTOR_INDEX: str = "exact"          # "exact", "hnsw" (graph search, needs hnswlib) or "pq" (product quantization, needs faiss-cpu)
+    VECTOR_INDEX_MIN_ROWS: int = 20000   # below this, exact search is used anyway
+    VECTOR_INDEX_HNSW_M: int = 32        # HNSW links per node (higher → better recall, bigger index)
+    VECTOR_INDEX_HNSW_EF: int = 256      # HNSW search list size (higher → better recall, slower)
+    VECTOR_STORE_DEVICE: str = "cpu"     # "cpu" or a torch device such as "cuda" (exact search on the GPU)
 
     # LLM
     LLM_MODEL: str = "gemini-2.0-flash"
@@ -45,6 +56,16 @@ class Settings(BaseSettings):
         ".c", ".h", ".hpp", ".swift", ".kt",
     ]
 
+    @cached_property
+    def IGNORED_DIRS_SET(self) -> frozenset[str]:
+        """IGNORED_DIRS as a frozenset for O(1) membership checks."""
+        return frozenset(self.IGNORED_DIRS)
+
+    @cached_property
+    def ALLOWED_EXTENSIONS_SET(self) -> frozenset[str]:
+        """ALLOWED_EXTENSIONS as a frozenset for O(1) membership checks."""
+        return frozenset(self.ALLOWED_EXTENSIONS)
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,6 +1,6 @@
 """SQLAlchemy database setup for SQLite."""
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
 from app.config import settings
@@ -11,6 +11,19 @@ engine = create_engine(
     echo=False,
 )
 
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _):
+    """Tune SQLite: WAL journaling so ingestion doesn't block readers, larger caches."""
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")   # 256 MB
+    cur.execute("PRAGMA cache_size=-65536")     # 64 MB
+    cur.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -29,5 +42,8 @@ def get_db():
 
 
 def init_db():
-    """Create all tables."""
+    """Create all tables, plus any indexes missing from existing databases."""
     Base.metadata.create_all(bind=engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
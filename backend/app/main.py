@@ -3,20 +3,25 @@
 import os
 import sys
 import time
+import atexit
+import queue
 import logging
-import traceback
+import logging.handlers
 from contextlib import asynccontextmanager
+from pathlib import Path
 
 from fastapi import FastAPI, Depends, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.database import init_db, get_db
 from app.models import Project
 from app.routers import upload, chat, edit
-from app.services import repo_service
+from app.services import repo_service, vector_store
 
 # ── Logging setup ───────────────────────────────────────────
 logging.basicConfig(
@@ -26,6 +31,15 @@ logging.basicConfig(
     stream=sys.stdout,
     force=True,
 )
+# Hand records to a background listener so stdout writes happen off request threads
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, *logging.getLogger().handlers, respect_handler_level=True,
+)
+logging.getLogger().handlers = [logging.handlers.QueueHandler(_log_queue)]
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 # Silence noisy third-party loggers
 for _name in (
     "urllib3", "httpcore", "httpx", "chromadb",
@@ -36,6 +50,19 @@ for _name in (
 
 logger = logging.getLogger("codecontext")
 
+_EXT_LANG = repo_service.EXTENSION_LANGUAGE_MAP
+
+# Resolved repo roots, keyed by project id
+_repo_roots: dict[int, Path] = {}
+
+
+def _repo_root(project: Project) -> Path:
+    """Return the resolved repository root for a project (cached)."""
+    root = _repo_roots.get(project.id)
+    if root is None:
+        root = _repo_roots[project.id] = Path(project.repo_path).resolve()
+    return root
+
 
 # ── Lifespan ────────────────────────────────────────────────
 
@@ -44,7 +71,9 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 CodeContext AI starting up...")
     init_db()
     logger.info("✅ Database initialized")
+    app.state.providers_payload = _build_providers()
     yield
+    vector_store.flush_all()
     logger.info("👋 CodeContext AI shutting down")
 
 
@@ -53,6 +82,7 @@ app = FastAPI(
     description="Self-hosted AI code intelligence — upload repos, ask questions, generate edits.",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # ── CORS ────────────────────────────────────────────────────
@@ -60,34 +90,56 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:3000", "http://127.0.0.1:5173"],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,  # let browsers cache preflights for a day
 )
 
 
 # ── Request logging middleware ──────────────────────────────
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start = time.perf_counter()
-    try:
-        response = await call_next(request)
-        elapsed = (time.perf_counter() - start) * 1000
-        logger.info("%s %s → %d (%.0fms)", request.method, request.url.path, response.status_code, elapsed)
-        return response
-    except Exception:
+class RequestLoggingMiddleware:
+    """Pure ASGI middleware that logs method, path, status and latency."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            elapsed = (time.perf_counter() - start) * 1000
+            logger.exception("%s %s → UNHANDLED (%.0fms)", scope["method"], scope["path"], elapsed)
+            if status_code is None:
+                response = JSONResponse(status_code=500, content={"detail": "Internal server error"})
+                await response(scope, receive, send)
+            return
+
         elapsed = (time.perf_counter() - start) * 1000
-        logger.error("%s %s → UNHANDLED (%.0fms)", request.method, request.url.path, elapsed)
-        traceback.print_exc()
-        return JSONResponse(status_code=500, content={"detail": "Internal server error"})
+        logger.info("%s %s → %d (%.0fms)", scope["method"], scope["path"], status_code or 0, elapsed)
+
+
+app.add_middleware(RequestLoggingMiddleware)
 
 
 # ── Global exception handler ───────────────────────────────
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error("Unhandled exception on %s %s: %s", request.method, request.url.path, exc)
-    traceback.print_exc()
+    logger.error("Unhandled exception on %s %s: %s", request.method, request.url.path, exc, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={"detail": f"Internal server error: {exc}"},
@@ -107,9 +159,8 @@ def root():
     return {"app": "CodeContext AI", "version": "0.1.0", "docs": "/docs"}
 
 
-@app.get("/api/providers")
-def list_providers():
-    """Return available LLM providers based on configured API keys."""
+def _build_providers() -> dict:
+    """Build the list of available LLM providers based on configured API keys."""
     providers = []
     if settings.GEMINI_API_KEY:
         providers.append({"id": "gemini", "name": "Google Gemini", "model": settings.LLM_MODEL})
@@ -120,29 +171,31 @@ def list_providers():
     return {"providers": providers, "default": providers[0]["id"] if providers else None}
 
 
+@app.get("/api/providers")
+def list_providers(request: Request):
+    """Return available LLM providers (computed once at startup)."""
+    return request.app.state.providers_payload
+
+
 @app.get("/api/projects")
 def list_projects(db: Session = Depends(get_db)):
     """List all projects."""
-    projects = db.query(Project).order_by(Project.created_at.desc()).all()
+    rows = db.execute(
+        select(
+            Project.id, Project.name, Project.source_type, Project.source_url,
+            Project.status, Project.total_files, Project.total_chunks, Project.created_at,
+        ).order_by(Project.created_at.desc())
+    ).all()
     return [
-        {
-            "id": p.id,
-            "name": p.name,
-            "source_type": p.source_type,
-            "source_url": p.source_url,
-            "status": p.status,
-            "total_files": p.total_files,
-            "total_chunks": p.total_chunks,
-            "created_at": p.created_at.isoformat() if p.created_at else None,
-        }
-        for p in projects
+        {**r._mapping, "created_at": r.created_at.isoformat() if r.created_at else None}
+        for r in rows
     ]
 
 
 @app.get("/api/projects/{project_id}")
 def get_project(project_id: int, db: Session = Depends(get_db)):
     """Get project details including file tree."""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found.")
 
@@ -163,32 +216,38 @@ def get_project(project_id: int, db: Session = Depends(get_db)):
     return result
 
 
-@app.get("/api/projects/{project_id}/file")
-def get_file_content(project_id: int, path: str, db: Session = Depends(get_db)):
-    """Read a specific file from the project."""
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found.")
-
-    full_path = os.path.join(project.repo_path, path)
-
+def _read_project_file(project: Project, path: str) -> str:
+    """
+    Read a file inside the project's repo. Path resolution, the checks and
+    the read all touch the disk, so callers run this in the threadpool.
+    """
     # Security: prevent path traversal
-    abs_repo = os.path.abspath(project.repo_path)
-    abs_file = os.path.abspath(full_path)
-    if not abs_file.startswith(abs_repo):
+    repo_root = _repo_root(project)
+    full_path = (repo_root / path).resolve()
+    if not full_path.is_relative_to(repo_root):
         raise HTTPException(status_code=403, detail="Access denied.")
 
-    if not os.path.isfile(full_path):
+    if not full_path.is_file():
         raise HTTPException(status_code=404, detail="File not found.")
 
     try:
         with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read()
+            return f.read()
     except Exception:
-        traceback.print_exc()
+        logger.exception("Failed to read %s", full_path)
         raise HTTPException(status_code=500, detail="Failed to read file.")
 
+
+@app.get("/api/projects/{project_id}/file")
+async def get_file_content(project_id: int, path: str, db: Session = Depends(get_db)):
+    """Read a specific file from the project."""
+    project = await run_in_threadpool(db.get, Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found.")
+
+    content = await run_in_threadpool(_read_project_file, project, path)
+
     ext = os.path.splitext(path)[1].lower()
-    language = repo_service.EXTENSION_LANGUAGE_MAP.get(ext, "text")
+    language = _EXT_LANG.get(ext, "text")
 
     return {"path": path, "content": content, "language": language}
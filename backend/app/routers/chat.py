@@ -1,15 +1,16 @@
 """Chat router: Q&A endpoint with repo context."""
 
 import logging
-import traceback
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, load_only
 
 from app.database import get_db
 from app.models import Project, ChatMessage
 from app.services.retrieval import retrieve, build_context_prompt
-from app.services.llm_service import ask_question
+from app.services.llm_service import ask_question, Provider
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 logger = logging.getLogger("codecontext.chat")
@@ -17,7 +18,7 @@ logger = logging.getLogger("codecontext.chat")
 
 class ChatRequest(BaseModel):
     question: str
-    provider: str = "gemini"
+    provider: Provider = "gemini"
 
 
 class ChatResponse(BaseModel):
@@ -25,20 +26,20 @@ class ChatResponse(BaseModel):
     sources: list[dict]
 
 
-@router.post("/{project_id}", response_model=ChatResponse)
+@router.post("/{project_id}", responses={200: {"model": ChatResponse}})
 def chat_with_project(
     project_id: int,
     request: ChatRequest,
     db: Session = Depends(get_db),
 ):
     """Ask a question about a project's codebase."""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found.")
     if project.status != "ready":
         raise HTTPException(status_code=400, detail=f"Project is still {project.status}. Please wait.")
 
-    provider = request.provider if request.provider in ("gemini", "grok", "kimi") else "gemini"
+    provider = request.provider
     logger.info("[Project %d] Chat via %s: '%s'", project_id, provider, request.question[:80])
 
     # 1. Retrieve relevant chunks
@@ -51,45 +52,56 @@ def chat_with_project(
     try:
         answer = ask_question(context, request.question, provider=provider)
     except Exception:
-        logger.error("LLM error (%s)", provider)
-        traceback.print_exc()
+        logger.exception("LLM error (%s)", provider)
         raise HTTPException(status_code=500, detail="LLM call failed")
 
     # 4. Build sources list
-    sources = []
-    seen_files = set()
+    # One entry per file, keeping the most relevant chunk (dicts preserve order)
+    by_file: dict[str, dict] = {}
     for chunk in chunks:
-        if chunk.file_path not in seen_files:
-            sources.append({
+        if chunk.file_path not in by_file:
+            by_file[chunk.file_path] = {
                 "file_path": chunk.file_path,
                 "symbol": chunk.symbol,
                 "language": chunk.language,
                 "start_line": chunk.start_line,
                 "end_line": chunk.end_line,
-            })
-            seen_files.add(chunk.file_path)
+            }
+    sources = list(by_file.values())
 
     # 5. Save to chat history
     db.add(ChatMessage(project_id=project_id, role="user", content=request.question))
     db.add(ChatMessage(project_id=project_id, role="assistant", content=answer, sources=sources))
     db.commit()
 
-    return ChatResponse(answer=answer, sources=sources)
+    # Built here from trusted values, so skip response_model re-validation
+    return ORJSONResponse({"answer": answer, "sources": sources})
 
 
 @router.get("/{project_id}/history")
-def get_chat_history(project_id: int, db: Session = Depends(get_db)):
-    """Get chat history for a project."""
-    project = db.query(Project).filter(Project.id == project_id).first()
+def get_chat_history(
+    project_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """Get chat history for a project (most recent `limit` messages, oldest first)."""
+    project = db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found.")
 
-    messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.project_id == project_id)
-        .order_by(ChatMessage.created_at.asc())
-        .all()
+    stmt = (
+        select(ChatMessage)
+        .options(load_only(
+            ChatMessage.id, ChatMessage.role, ChatMessage.content,
+            ChatMessage.sources, ChatMessage.created_at,
+        ))
+        .where(ChatMessage.project_id == project_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(limit)
+        .offset(offset)
     )
+    messages = db.scalars(stmt).all()
 
     return [
         {
@@ -99,5 +111,5 @@ def get_chat_history(project_id: int, db: Session = Depends(get_db)):
             "sources": m.sources,
             "created_at": m.created_at.isoformat() if m.created_at else None,
         }
-        for m in messages
+        for m in reversed(messages)
     ]
@@ -2,15 +2,16 @@
 
 import os
 import logging
-import traceback
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import Project
 from app.services.retrieval import retrieve, build_context_prompt
-from app.services.llm_service import generate_code_edit
+from app.services.llm_service import generate_code_edit, Provider
 from app.services.patch_service import generate_patch
 
 router = APIRouter(prefix="/api/edit", tags=["edit"])
@@ -20,7 +21,7 @@ logger = logging.getLogger("codecontext.edit")
 class EditRequest(BaseModel):
     instruction: str
     file_path: str
-    provider: str = "gemini"
+    provider: Provider = "gemini"
 
 
 class EditResponse(BaseModel):
@@ -30,38 +31,49 @@ class EditResponse(BaseModel):
     patch: str
 
 
-@router.post("/{project_id}", response_model=EditResponse)
-def edit_file(
+def _read_source(full_path: str, file_path: str) -> str:
+    """Read the file being edited (blocking: callers run it in the threadpool)."""
+    if not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
+    try:
+        with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    except Exception:
+        logger.exception("Failed to read %s", full_path)
+        raise HTTPException(status_code=500, detail="Failed to read file")
+
+
+def _write_source(full_path: str, content: str) -> None:
+    """Write an edited file back (blocking: callers run it in the threadpool)."""
+    with open(full_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+@router.post("/{project_id}", responses={200: {"model": EditResponse}})
+async def edit_file(
     project_id: int,
     request: EditRequest,
     db: Session = Depends(get_db),
 ):
     """Generate a code edit for a specific file."""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await run_in_threadpool(db.get, Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found.")
     if project.status != "ready":
         raise HTTPException(status_code=400, detail=f"Project is still {project.status}. Please wait.")
 
-    provider = request.provider if request.provider in ("gemini", "grok", "kimi") else "gemini"
+    provider = request.provider
 
     full_path = os.path.join(project.repo_path, request.file_path)
-    if not os.path.isfile(full_path):
-        raise HTTPException(status_code=404, detail=f"File not found: {request.file_path}")
-
-    try:
-        with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-            original_code = f.read()
-    except Exception:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail="Failed to read file")
+    original_code = await run_in_threadpool(_read_source, full_path, request.file_path)
 
     logger.info("[Project %d] Edit via %s for %s: '%s'", project_id, provider, request.file_path, request.instruction[:80])
-    chunks = retrieve(project_id, f"{request.instruction} in {request.file_path}")
+    chunks = await run_in_threadpool(retrieve, project_id, f"{request.instruction} in {request.file_path}")
     context = build_context_prompt(chunks)
 
     try:
-        modified_code = generate_code_edit(
+        modified_code = await run_in_threadpool(
+            generate_code_edit,
             context=context,
             file_content=original_code,
             file_path=request.file_path,
@@ -69,45 +81,42 @@ def edit_file(
             provider=provider,
         )
     except Exception:
-        logger.error("LLM edit error (%s)", provider)
-        traceback.print_exc()
+        logger.exception("LLM edit error (%s)", provider)
         raise HTTPException(status_code=500, detail="LLM call failed")
 
     patch = generate_patch(original_code, modified_code, request.file_path)
 
-    return EditResponse(
-        file_path=request.file_path,
-        original_code=original_code,
-        modified_code=modified_code,
-        patch=patch,
-    )
+    # Built here from trusted values, so skip response_model re-validation
+    return ORJSONResponse({
+        "file_path": request.file_path,
+        "original_code": original_code,
+        "modified_code": modified_code,
+        "patch": patch,
+    })
 
 
 @router.post("/{project_id}/apply")
-def apply_edit(
+async def apply_edit(
     project_id: int,
     request: EditRequest,
     db: Session = Depends(get_db),
 ):
     """Apply a code edit by writing the modified content to disk."""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await run_in_threadpool(db.get, Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found.")
 
-    provider = request.provider if request.provider in ("gemini", "grok", "kimi") else "gemini"
+    provider = request.provider
 
     full_path = os.path.join(project.repo_path, request.file_path)
-    if not os.path.isfile(full_path):
-        raise HTTPException(status_code=404, detail=f"File not found: {request.file_path}")
+    original_code = await run_in_threadpool(_read_source, full_path, request.file_path)
 
     try:
-        with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-            original_code = f.read()
-
-        chunks = retrieve(project_id, f"{request.instruction} in {request.file_path}")
+        chunks = await run_in_threadpool(retrieve, project_id, f"{request.instruction} in {request.file_path}")
         context = build_context_prompt(chunks)
 
-        modified_code = generate_code_edit(
+        modified_code = await run_in_threadpool(
+            generate_code_edit,
             context=context,
             file_content=original_code,
             file_path=request.file_path,
@@ -115,13 +124,12 @@ def apply_edit(
             provider=provider,
         )
 
-        with open(full_path, "w", encoding="utf-8") as f:
-            f.write(modified_code)
+        await run_in_threadpool(_write_source, full_path, modified_code)
 
         logger.info("[Project %d] ✅ Applied edit to %s via %s", project_id, request.file_path, provider)
 
     except Exception:
-        traceback.print_exc()
+        logger.exception("[Project %d] Failed to apply edit to %s", project_id, request.file_path)
         raise HTTPException(status_code=500, detail="Failed to apply edit")
 
     return {"message": "Edit applied successfully.", "file_path": request.file_path}
@@ -1,11 +1,14 @@
 """Upload router: GitHub clone and ZIP upload endpoints."""
 
+import os
 import logging
-import traceback
+import shutil
+import tempfile
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models import Project, Chunk
 from app.services import repo_service, chunking, embedding, vector_store
 
@@ -13,20 +16,15 @@ router = APIRouter(prefix="/api/upload", tags=["upload"])
 logger = logging.getLogger("codecontext.upload")
 
 
-def _process_repo(project_id: int, repo_path: str, db_url: str):
+def _process_repo(project_id: int, repo_path: str):
     """
     Background task: parse, chunk, embed, and store a repository.
     Runs after the upload endpoint returns.
     """
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-
-    engine = create_engine(db_url, connect_args={"check_same_thread": False})
-    SessionLocal = sessionmaker(bind=engine)
     db = SessionLocal()
 
     try:
-        project = db.query(Project).filter(Project.id == project_id).first()
+        project = db.get(Project, project_id)
         if not project:
             return
 
@@ -44,10 +42,7 @@ def _process_repo(project_id: int, repo_path: str, db_url: str):
 
         # 2. Chunk all files
         logger.info("[Project %d] Chunking %d files...", project_id, len(files))
-        all_chunks: list[chunking.CodeChunk] = []
-        for f in files:
-            file_chunks = chunking.chunk_file(f.relative_path, f.content, f.language)
-            all_chunks.extend(file_chunks)
+        all_chunks = chunking.chunk_files(files)
 
         if not all_chunks:
             project.status = "ready"
@@ -56,11 +51,11 @@ def _process_repo(project_id: int, repo_path: str, db_url: str):
 
         # 3. Embed all chunks
         logger.info("[Project %d] Embedding %d chunks...", project_id, len(all_chunks))
-        texts = [
+        # Generator: embed_texts materializes only one batch of inputs at a time
+        embeddings = embedding.embed_texts(
             f"File: {c.file_path}\nSymbol: {c.symbol}\nLanguage: {c.language}\n\n{c.code}"
             for c in all_chunks
-        ]
-        embeddings = embedding.embed_texts(texts)
+        )
 
         # 4. Store in vector DB
         logger.info("[Project %d] Storing in vector DB...", project_id)
@@ -77,19 +72,22 @@ def _process_repo(project_id: int, repo_path: str, db_url: str):
             for c in all_chunks
         ]
         vector_store.add_chunks(project_id, ids, documents, embeddings, metadatas)
+        vector_store.flush(project_id)
 
         # 5. Store chunk records in SQLite
-        for i, c in enumerate(all_chunks):
-            db.add(Chunk(
-                project_id=project_id,
-                file_path=c.file_path,
-                symbol=c.symbol,
-                content=c.code,
-                language=c.language,
-                start_line=c.start_line,
-                end_line=c.end_line,
-                chunk_index=i,
-            ))
+        db.bulk_insert_mappings(Chunk, [
+            {
+                "project_id": project_id,
+                "file_path": c.file_path,
+                "symbol": c.symbol,
+                "content": c.code,
+                "language": c.language,
+                "start_line": c.start_line,
+                "end_line": c.end_line,
+                "chunk_index": i,
+            }
+            for i, c in enumerate(all_chunks)
+        ])
 
         project.total_chunks = len(all_chunks)
         project.status = "ready"
@@ -97,9 +95,8 @@ def _process_repo(project_id: int, repo_path: str, db_url: str):
         logger.info("[Project %d] ✅ Processing complete — %d chunks indexed", project_id, len(all_chunks))
 
     except Exception:
-        logger.error("[Project %d] Processing failed", project_id)
-        traceback.print_exc()
-        project = db.query(Project).filter(Project.id == project_id).first()
+        logger.exception("[Project %d] Processing failed", project_id)
+        project = db.get(Project, project_id)
         if project:
             project.status = "error"
             db.commit()
@@ -117,7 +114,7 @@ def upload_github(
     try:
         repo_path = repo_service.clone_repo(url)
     except Exception:
-        traceback.print_exc()
+        logger.exception("Failed to clone %s", url)
         raise HTTPException(status_code=400, detail="Failed to clone repository")
 
     name = url.rstrip("/").split("/")[-1].replace(".git", "")
@@ -133,8 +130,7 @@ def upload_github(
     db.commit()
     db.refresh(project)
 
-    from app.config import settings
-    background_tasks.add_task(_process_repo, project.id, repo_path, settings.DATABASE_URL)
+    background_tasks.add_task(_process_repo, project.id, repo_path)
 
     return {
         "project_id": project.id,
@@ -154,12 +150,18 @@ async def upload_zip(
     if not file.filename or not file.filename.endswith(".zip"):
         raise HTTPException(status_code=400, detail="Please upload a .zip file.")
 
+    # Stream the upload to disk instead of buffering it in memory
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".zip")
     try:
-        content = await file.read()
-        repo_path = repo_service.extract_zip(content, file.filename)
+        await run_in_threadpool(shutil.copyfileobj, file.file, tmp, 1 << 20)
+        tmp.close()
+        repo_path = await run_in_threadpool(repo_service.extract_zip_path, tmp.name, file.filename)
     except Exception:
-        traceback.print_exc()
+        logger.exception("Failed to extract ZIP '%s'", file.filename)
         raise HTTPException(status_code=400, detail="Failed to extract ZIP")
+    finally:
+        tmp.close()
+        os.remove(tmp.name)
 
     name = file.filename.replace(".zip", "")
 
@@ -173,8 +175,7 @@ async def upload_zip(
     db.commit()
     db.refresh(project)
 
-    from app.config import settings
-    background_tasks.add_task(_process_repo, project.id, repo_path, settings.DATABASE_URL)
+    background_tasks.add_task(_process_repo, project.id, repo_path)
 
     return {
         "project_id": project.id,
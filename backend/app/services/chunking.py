@@ -2,9 +2,13 @@
 
 import ast
 import logging
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 
+import numpy as np
+
 from app.config import settings
 
 logger = logging.getLogger("codecontext.chunking")
@@ -45,10 +49,33 @@ def chunk_file(file_path: str, content: str, language: str) -> list[CodeChunk]:
     return chunks
 
 
+def chunk_files(files: list) -> list[CodeChunk]:
+    """
+    Chunk many files, fanning out across worker processes for large repos.
+    Accepts objects with relative_path, content and language attributes.
+    """
+    if len(files) < settings.PARALLEL_CHUNK_MIN_FILES:
+        results = map(_chunk_one, files)
+    else:
+        workers = settings.CHUNK_WORKERS or os.cpu_count()
+        logger.info("Chunking %d files across %d processes", len(files), workers)
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_chunk_one, files, chunksize=8))
+
+    all_chunks: list[CodeChunk] = []
+    for file_chunks in results:
+        all_chunks.extend(file_chunks)
+    return all_chunks
+
+
+def _chunk_one(f) -> list[CodeChunk]:
+    """Top-level (picklable) worker for chunk_files."""
+    return chunk_file(f.relative_path, f.content, f.language)
+
+
 def _chunk_python(file_path: str, content: str) -> list[CodeChunk]:
     """Parse Python using the AST module to extract classes and functions."""
     chunks: list[CodeChunk] = []
-    lines = content.splitlines()
 
     try:
         tree = ast.parse(content)
@@ -56,6 +83,8 @@ def _chunk_python(file_path: str, content: str) -> list[CodeChunk]:
         logger.debug("Python AST parse failed for %s: %s", file_path, e)
         return []
 
+    newlines = _line_index(content).tolist()
+
     # Collect module-level docstring / imports as a preamble chunk
     first_node_line = None
     for node in ast.iter_child_nodes(tree):
@@ -64,8 +93,8 @@ def _chunk_python(file_path: str, content: str) -> list[CodeChunk]:
             break
 
     if first_node_line and first_node_line > 1:
-        preamble = "\n".join(lines[: first_node_line - 1]).strip()
-        if preamble and len(preamble.splitlines()) >= 3:
+        preamble = _slice_lines(content, newlines, 1, first_node_line - 1).strip()
+        if preamble.count("\n") >= 2:
             chunks.append(CodeChunk(
                 file_path=file_path,
                 symbol="<module>",
@@ -79,11 +108,10 @@ def _chunk_python(file_path: str, content: str) -> list[CodeChunk]:
         if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
             start = node.lineno
             end = node.end_lineno or start
-            code = "\n".join(lines[start - 1 : end])
             chunks.append(CodeChunk(
                 file_path=file_path,
                 symbol=node.name,
-                code=code,
+                code=_slice_lines(content, newlines, start, end),
                 language="python",
                 start_line=start,
                 end_line=end,
@@ -92,27 +120,26 @@ def _chunk_python(file_path: str, content: str) -> list[CodeChunk]:
         elif isinstance(node, ast.ClassDef):
             start = node.lineno
             end = node.end_lineno or start
-            code = "\n".join(lines[start - 1 : end])
 
             # If the class is small enough, keep it whole
             if (end - start) <= settings.MAX_CHUNK_LINES:
                 chunks.append(CodeChunk(
                     file_path=file_path,
                     symbol=node.name,
-                    code=code,
+                    code=_slice_lines(content, newlines, start, end),
                     language="python",
                     start_line=start,
                     end_line=end,
                 ))
             else:
                 # Split class into its methods
-                class_header_end = start
-                for child in ast.iter_child_nodes(node):
-                    if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                        class_header_end = child.lineno - 1
-                        break
+                methods = [
+                    child for child in ast.iter_child_nodes(node)
+                    if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+                ]
+                class_header_end = methods[0].lineno - 1 if methods else start
 
-                header = "\n".join(lines[start - 1 : class_header_end])
+                header = _slice_lines(content, newlines, start, class_header_end)
                 if header.strip():
                     chunks.append(CodeChunk(
                         file_path=file_path,
@@ -123,52 +150,56 @@ def _chunk_python(file_path: str, content: str) -> list[CodeChunk]:
                         end_line=class_header_end,
                     ))
 
-                for child in ast.iter_child_nodes(node):
-                    if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                        c_start = child.lineno
-                        c_end = child.end_lineno or c_start
-                        c_code = "\n".join(lines[c_start - 1 : c_end])
-                        chunks.append(CodeChunk(
-                            file_path=file_path,
-                            symbol=f"{node.name}.{child.name}",
-                            code=c_code,
-                            language="python",
-                            start_line=c_start,
-                            end_line=c_end,
-                        ))
+                for child in methods:
+                    c_start = child.lineno
+                    c_end = child.end_lineno or c_start
+                    chunks.append(CodeChunk(
+                        file_path=file_path,
+                        symbol=f"{node.name}.{child.name}",
+                        code=_slice_lines(content, newlines, c_start, c_end),
+                        language="python",
+                        start_line=c_start,
+                        end_line=c_end,
+                    ))
 
     return chunks
 
 
-# Regex patterns for JS/TS splitting
-_JS_PATTERNS = [
+# Regex patterns for JS/TS splitting, unioned into one alternation so each
+# line costs a single match() call. Alternatives are tried in order, so the
+# first one that matches wins. Each alternative captures the declared name in
+# its own named group, so m[m.lastgroup] is the symbol.
+_JS_BOUNDARY = re.compile("|".join((
     # export default function / export function
-    re.compile(r"^(export\s+(?:default\s+)?(?:async\s+)?function\s+\w+)", re.MULTILINE),
+    r"export\s+(?:default\s+)?(?:async\s+)?function\s+(?P<expfn>\w+)",
     # function declarations
-    re.compile(r"^((?:async\s+)?function\s+\w+)", re.MULTILINE),
+    r"(?:async\s+)?function\s+(?P<fn>\w+)",
     # const/let/var arrow functions or class expressions
-    re.compile(r"^((?:export\s+)?(?:const|let|var)\s+\w+\s*=\s*(?:async\s+)?(?:\([^)]*\)|[^=])\s*=>)", re.MULTILINE),
+    r"(?:export\s+)?(?:const|let|var)\s+(?P<arrow>\w+)\s*=\s*(?:async\s+)?(?:\([^)]*\)|[^=])\s*=>",
     # class declarations
-    re.compile(r"^((?:export\s+(?:default\s+)?)?class\s+\w+)", re.MULTILINE),
-]
+    r"(?:export\s+(?:default\s+)?)?class\s+(?P<cls>\w+)",
+)))
 
 
 def _chunk_javascript(file_path: str, content: str, language: str) -> list[CodeChunk]:
     """Split JS/TS files by function/class/export boundaries."""
-    lines = content.splitlines()
-    if not lines:
+    if not content:
         return []
 
-    # Find all boundary lines
-    boundaries: list[tuple[int, str]] = []
-    for i, line in enumerate(lines):
-        for pattern in _JS_PATTERNS:
-            match = pattern.match(line)
-            if match:
-                # Try to extract a symbol name
-                symbol = _extract_js_symbol(line)
-                boundaries.append((i, symbol))
-                break
+    index = _line_index(content)
+    newlines = index.tolist()
+    num_lines = len(newlines) + (not content.endswith("\n"))
+    line_starts = np.concatenate(([0], index + 1))[:num_lines].tolist()
+    line_ends = newlines + [len(content)]
+
+    # Find all boundary lines, matching each line in place (endpos stops a
+    # pattern from running on into the next line)
+    match = _JS_BOUNDARY.match
+    boundaries: list[tuple[int, str]] = [
+        (i, m[m.lastgroup])
+        for i, (pos, endpos) in enumerate(zip(line_starts, line_ends))
+        if (m := match(content, pos, endpos))
+    ]
 
     if not boundaries:
         return []
@@ -177,8 +208,8 @@ def _chunk_javascript(file_path: str, content: str, language: str) -> list[CodeC
 
     # Preamble (imports, etc.) before first boundary
     if boundaries[0][0] > 0:
-        preamble = "\n".join(lines[: boundaries[0][0]]).strip()
-        if preamble and len(preamble.splitlines()) >= 2:
+        preamble = _slice_lines(content, newlines, 1, boundaries[0][0]).strip()
+        if "\n" in preamble:
             chunks.append(CodeChunk(
                 file_path=file_path,
                 symbol="<imports>",
@@ -191,8 +222,8 @@ def _chunk_javascript(file_path: str, content: str, language: str) -> list[CodeC
     # Create chunks between boundaries
     for i, (line_idx, symbol) in enumerate(boundaries):
         start = line_idx
-        end = boundaries[i + 1][0] - 1 if i + 1 < len(boundaries) else len(lines) - 1
-        code = "\n".join(lines[start : end + 1]).rstrip()
+        end = boundaries[i + 1][0] - 1 if i + 1 < len(boundaries) else num_lines - 1
+        code = _slice_lines(content, newlines, start + 1, end + 1).rstrip()
 
         if code.strip():
             chunks.append(CodeChunk(
@@ -207,52 +238,58 @@ def _chunk_javascript(file_path: str, content: str, language: str) -> list[CodeC
     return chunks
 
 
-def _extract_js_symbol(line: str) -> str:
-    """Try to extract a symbol name from a JS/TS declaration line."""
-    patterns = [
-        r"(?:export\s+(?:default\s+)?)?(?:async\s+)?function\s+(\w+)",
-        r"(?:export\s+)?(?:const|let|var)\s+(\w+)",
-        r"(?:export\s+(?:default\s+)?)?class\s+(\w+)",
-    ]
-    for p in patterns:
-        m = re.search(p, line)
-        if m:
-            return m.group(1)
-    return "<anonymous>"
+def _line_index(content: str) -> np.ndarray:
+    """Character offsets of every newline in content, found in C via NumPy."""
+    if content.isascii():
+        buf = np.frombuffer(content.encode("ascii"), dtype=np.uint8)
+    else:
+        # One code point per element, so indices stay character offsets
+        buf = np.frombuffer(content.encode("utf-32-le"), dtype=np.uint32)
+    return np.flatnonzero(buf == 0x0A)
+
+
+def _slice_lines(content: str, newlines, first: int, last: int) -> str:
+    """Return lines first..last (1-based, inclusive) of content, without the final newline."""
+    if last < first:
+        return ""
+    start = newlines[first - 2] + 1 if first > 1 else 0
+    end = newlines[last - 1] if last <= len(newlines) else len(content)
+    return content[start:end]
 
 
 def _chunk_by_lines(
     file_path: str, content: str, language: str
 ) -> list[CodeChunk]:
     """Fallback: split file into fixed-size line windows with overlap."""
-    lines = content.splitlines()
-    if not lines:
+    if not content:
         return []
 
+    num_lines = content.count("\n") + (not content.endswith("\n"))
+
     # Small files → single chunk
-    if len(lines) <= settings.MAX_CHUNK_LINES:
+    if num_lines <= settings.MAX_CHUNK_LINES:
         return [CodeChunk(
             file_path=file_path,
             symbol="<file>",
             code=content,
             language=language,
             start_line=1,
-            end_line=len(lines),
+            end_line=num_lines,
         )]
 
+    newlines = _line_index(content).tolist()
     window = settings.FALLBACK_CHUNK_LINES
     overlap = 20
     chunks: list[CodeChunk] = []
     i = 0
     idx = 0
 
-    while i < len(lines):
-        end = min(i + window, len(lines))
-        code = "\n".join(lines[i:end])
+    while i < num_lines:
+        end = min(i + window, num_lines)
         chunks.append(CodeChunk(
             file_path=file_path,
             symbol=f"<block_{idx}>",
-            code=code,
+            code=_slice_lines(content, newlines, i + 1, end),
             language=language,
             start_line=i + 1,
             end_line=end,
@@ -1,52 +1,176 @@
 """Embedding service using sentence-transformers (all-MiniLM-L6-v2)."""
 
 import logging
+import threading
 import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from functools import cache
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from app.config import settings
 
 logger = logging.getLogger("codecontext.embedding")
 
-# Lazy-loaded singleton
-_model: SentenceTransformer | None = None
+# Matches sentence-transformers' max_seq_length for MiniLM
+_ONNX_MAX_SEQ_LEN = 256
 
+# Texts handed to each encode() call, in model batches. encode() sorts its
+# input by length before batching, so a wide window keeps padding low.
+_ENCODE_WINDOW_BATCHES = 32
 
-def _get_model() -> SentenceTransformer:
-    """Load the embedding model (cached after first call)."""
-    global _model
-    if _model is None:
-        logger.info("Loading embedding model: %s...", settings.EMBEDDING_MODEL)
-        t0 = time.time()
-        _model = SentenceTransformer(settings.EMBEDDING_MODEL)
-        logger.info("Model loaded in %.1fs", time.time() - t0)
-    return _model
+# LRU cache of query embeddings, keyed by whitespace-collapsed, lowercased text
+_QUERY_CACHE_SIZE = 512
+_query_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+_query_cache_lock = threading.Lock()
 
 
-def embed_texts(texts: list[str]) -> list[list[float]]:
+class _OnnxEmbedder:
     """
-    Generate embeddings for a list of text strings.
-    Returns a list of float vectors (384-dimensional for MiniLM).
+    int8-quantized ONNX Runtime model exposing the subset of
+    SentenceTransformer.encode() used here (mean pooling + L2 norm).
+    """
+
+    def __init__(self, model, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.config.hidden_size
+
+    def encode(
+        self, sentences, batch_size: int = 32, show_progress_bar: bool = False,
+        convert_to_numpy: bool = True, normalize_embeddings: bool = False,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        # Batch by length, like SentenceTransformer.encode, to limit padding
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        by_length = [sentences[i] for i in order]
+        out: list[np.ndarray] = []
+        for start in range(0, len(by_length), batch_size):
+            enc = self.tokenizer(
+                by_length[start : start + batch_size],
+                padding=True, truncation=True,
+                max_length=_ONNX_MAX_SEQ_LEN, return_tensors="np",
+            )
+            hidden = self.model(**enc).last_hidden_state
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            out.append(pooled.astype(np.float32, copy=False))
+
+        embeddings = np.empty((len(order), out[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.vstack(out)
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+        return embeddings[0] if single else embeddings
+
+
+def _load_onnx_int8() -> _OnnxEmbedder:
+    """Export + dynamically quantize the model once, caching it on disk."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    name = settings.EMBEDDING_MODEL.replace("/", "__")
+    quant_dir = Path(settings.EMBEDDING_CACHE_DIR) / f"{name}-int8"
+
+    if not (quant_dir / "model_quantized.onnx").exists():
+        logger.info("Exporting %s to int8 ONNX → %s", settings.EMBEDDING_MODEL, quant_dir)
+        fp32 = ORTModelForFeatureExtraction.from_pretrained(
+            settings.EMBEDDING_MODEL, export=True, provider="CPUExecutionProvider",
+        )
+        quantizer = ORTQuantizer.from_pretrained(fp32)
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=quant_dir, quantization_config=qconfig)
+        AutoTokenizer.from_pretrained(settings.EMBEDDING_MODEL).save_pretrained(quant_dir)
+
+    model = ORTModelForFeatureExtraction.from_pretrained(
+        quant_dir, file_name="model_quantized.onnx", provider="CPUExecutionProvider",
+    )
+    return _OnnxEmbedder(model, AutoTokenizer.from_pretrained(quant_dir))
+
+
+@cache
+def _get_model():
+    """Load the embedding model (SentenceTransformer or _OnnxEmbedder), once."""
+    logger.info("Loading embedding model: %s (%s)...", settings.EMBEDDING_MODEL, settings.EMBEDDING_BACKEND)
+    t0 = time.time()
+    model = None
+    if settings.EMBEDDING_BACKEND == "onnx-int8":
+        try:
+            model = _load_onnx_int8()
+        except ImportError:
+            logger.warning("optimum[onnxruntime] is not installed; falling back to PyTorch embeddings")
+    if model is None:
+        model = SentenceTransformer(settings.EMBEDDING_MODEL)
+    logger.info("Model loaded in %.1fs", time.time() - t0)
+    return model
+
+
+def embed_texts(texts: Iterable[str]) -> np.ndarray:
+    """
+    Generate embeddings for an iterable of text strings.
+
+    Texts are pulled _ENCODE_WINDOW_BATCHES * EMBEDDING_BATCH_SIZE at a
+    time, so a generator keeps only one window of input strings alive, while
+    each encode() call still sorts enough texts by length to batch similar
+    lengths together. Returns a float32 array of shape (N, D)
+    (384-dimensional for MiniLM).
     """
     model = _get_model()
-    logger.info("Embedding %d texts (batch_size=%d)...", len(texts), settings.EMBEDDING_BATCH_SIZE)
+    batch_size = settings.EMBEDDING_BATCH_SIZE
+    it = iter(texts)
+    blocks: list[np.ndarray] = []
     t0 = time.time()
-    embeddings = model.encode(
-        texts,
-        batch_size=settings.EMBEDDING_BATCH_SIZE,
-        show_progress_bar=False,
-        normalize_embeddings=True,
-    )
+    while window := list(islice(it, _ENCODE_WINDOW_BATCHES * batch_size)):
+        blocks.append(model.encode(
+            window,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ))
+
+    if not blocks:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    embeddings = np.vstack(blocks).astype(np.float32, copy=False)
     elapsed = time.time() - t0
-    logger.info("Embedded %d texts in %.1fs (%.0f texts/s)", len(texts), elapsed, len(texts) / max(elapsed, 0.01))
-    return embeddings.tolist()
+    logger.info("Embedded %d texts in %.1fs (%.0f texts/s)", len(embeddings), elapsed, len(embeddings) / max(elapsed, 0.01))
+    return embeddings
+
 
+def embed_query(query: str) -> np.ndarray:
+    """
+    Generate an embedding for a single query string, as a read-only float32
+    vector.
+
+    Results are cached under the whitespace-collapsed, lowercased query, so
+    re-asked questions and frontend retries skip another forward pass. The
+    text embedded on a miss is the query as given.
+    """
+    key = " ".join(query.split()).lower()
+    with _query_cache_lock:
+        embedding = _query_cache.get(key)
+        if embedding is not None:
+            _query_cache.move_to_end(key)
+            return embedding
 
-def embed_query(query: str) -> list[float]:
-    """Generate an embedding for a single query string."""
     model = _get_model()
-    embedding = model.encode(
-        query,
-        normalize_embeddings=True,
+    embedding = np.asarray(
+        model.encode(query, normalize_embeddings=True),
+        dtype=np.float32,
     )
-    return embedding.tolist()
+    embedding.flags.writeable = False
+    with _query_cache_lock:
+        _query_cache[key] = embedding
+        if len(_query_cache) > _QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    return embedding
@@ -2,6 +2,8 @@
 
 import logging
 import time
+from functools import cache
+from typing import Literal
 from openai import OpenAI
 import google.generativeai as genai
 
@@ -9,50 +11,44 @@ from app.config import settings
 
 logger = logging.getLogger("codecontext.llm")
 
-_gemini_configured = False
-_grok_client = None
-_kimi_client = None
+Provider = Literal["gemini", "grok", "kimi"]
 
 
 # ── Provider setup ──────────────────────────────────────────
 
-def _ensure_gemini():
+@cache
+def _ensure_gemini() -> None:
     """Configure the Gemini API key (once)."""
-    global _gemini_configured
-    if not _gemini_configured:
-        if not settings.GEMINI_API_KEY:
-            raise RuntimeError("GEMINI_API_KEY is not set. Please add it to your .env file.")
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        _gemini_configured = True
-        logger.info("Gemini configured (model: %s)", settings.LLM_MODEL)
+    if not settings.GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY is not set. Please add it to your .env file.")
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    logger.info("Gemini configured (model: %s)", settings.LLM_MODEL)
 
 
+@cache
 def _get_grok_client() -> OpenAI:
     """Get or create the Grok (xAI) OpenAI-compatible client."""
-    global _grok_client
-    if _grok_client is None:
-        if not settings.GROK_API_KEY:
-            raise RuntimeError("GROK_API_KEY is not set. Please add it to your .env file.")
-        _grok_client = OpenAI(
-            api_key=settings.GROK_API_KEY,
-            base_url="https://api.x.ai/v1",
-        )
-        logger.info("Grok configured (model: %s)", settings.GROK_MODEL)
-    return _grok_client
+    if not settings.GROK_API_KEY:
+        raise RuntimeError("GROK_API_KEY is not set. Please add it to your .env file.")
+    client = OpenAI(
+        api_key=settings.GROK_API_KEY,
+        base_url="https://api.x.ai/v1",
+    )
+    logger.info("Grok configured (model: %s)", settings.GROK_MODEL)
+    return client
 
 
+@cache
 def _get_kimi_client() -> OpenAI:
     """Get or create the Kimi (Moonshot via NVIDIA NIM) OpenAI-compatible client."""
-    global _kimi_client
-    if _kimi_client is None:
-        if not settings.KIMI_API_KEY:
-            raise RuntimeError("KIMI_API_KEY is not set. Please add it to your .env file.")
-        _kimi_client = OpenAI(
-            api_key=settings.KIMI_API_KEY,
-            base_url="https://integrate.api.nvidia.com/v1",
-        )
-        logger.info("Kimi configured (model: %s)", settings.KIMI_MODEL)
-    return _kimi_client
+    if not settings.KIMI_API_KEY:
+        raise RuntimeError("KIMI_API_KEY is not set. Please add it to your .env file.")
+    client = OpenAI(
+        api_key=settings.KIMI_API_KEY,
+        base_url="https://integrate.api.nvidia.com/v1",
+    )
+    logger.info("Kimi configured (model: %s)", settings.KIMI_MODEL)
+    return client
 
 
 # ── Prompt builders ─────────────────────────────────────────
@@ -112,9 +108,15 @@ IMPORTANT RULES:
 
 # ── Gemini calls ────────────────────────────────────────────
 
-def _gemini_generate(prompt: str, temperature: float, max_tokens: int) -> str:
+@cache
+def _gemini_model(name: str) -> genai.GenerativeModel:
+    """One GenerativeModel per model name, reused across requests."""
     _ensure_gemini()
-    model = genai.GenerativeModel(settings.LLM_MODEL)
+    return genai.GenerativeModel(name)
+
+
+def _gemini_generate(prompt: str, temperature: float, max_tokens: int) -> str:
+    model = _gemini_model(settings.LLM_MODEL)
     response = model.generate_content(
         prompt,
         generation_config=genai.GenerationConfig(
@@ -208,10 +210,11 @@ def generate_code_edit(
     # Strip markdown code fences if present
     result = result.strip()
     if result.startswith("```"):
-        lines = result.split("\n")
-        lines = lines[1:]
-        if lines and lines[-1].strip() == "```":
-            lines = lines[:-1]
-        result = "\n".join(lines)
+        # Drop the opening fence line, then a closing fence line if present
+        nl = result.find("\n")
+        result = result[nl + 1:] if nl != -1 else ""
+        nl = result.rfind("\n")
+        if result[nl + 1:].strip() == "```":
+            result = result[:nl] if nl != -1 else ""
 
     return result
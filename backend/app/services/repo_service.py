@@ -3,10 +3,11 @@
 import os
 import logging
 import shutil
-import tempfile
+import subprocess
 import zipfile
 import uuid
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dataclasses import dataclass
 
@@ -14,6 +15,9 @@ from app.config import settings
 
 logger = logging.getLogger("codecontext.repo")
 
+# Thread count for filter_files reads, which are I/O-bound
+_READ_WORKERS = 32
+
 
 @dataclass
 class FileInfo:
@@ -35,10 +39,37 @@ EXTENSION_LANGUAGE_MAP = {
 }
 
 
+def _sparse_patterns() -> list[str]:
+    """
+    Non-cone sparse-checkout patterns mirroring filter_files: allowed
+    extensions (case-insensitive, as filter_files lowercases them) and .env
+    files, minus ignored and hidden directories.
+    """
+    patterns = [
+        "*" + "".join(f"[{c.lower()}{c.upper()}]" if c.isalpha() else c for c in ext)
+        for ext in settings.ALLOWED_EXTENSIONS
+    ]
+    patterns.append(".env*")
+    patterns += [f"!**/{d}/**" for d in settings.IGNORED_DIRS]
+    patterns.append("!**/.*/**")
+    return patterns
+
+
+def _git(*args: str, cwd: str | None = None) -> None:
+    """Run a git command, raising RuntimeError with git's stderr on failure."""
+    try:
+        subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"git {args[0]} failed: {e.stderr.strip()}") from e
+
+
 def clone_repo(github_url: str) -> str:
-    """Clone a GitHub repository (shallow) and return the local path."""
-    import git
+    """
+    Clone a GitHub repository (shallow, blobless) and return the local path.
 
+    Only files filter_files could accept are checked out, so blobs for
+    binaries, assets and vendored dirs are never downloaded.
+    """
     repo_id = str(uuid.uuid4())[:8]
     dest = os.path.join(settings.REPOS_DIR, repo_id)
     os.makedirs(dest, exist_ok=True)
@@ -49,29 +80,33 @@ def clone_repo(github_url: str) -> str:
         raise ValueError("Only HTTPS GitHub URLs are supported.")
 
     logger.info("Cloning %s → %s", url, dest)
-    git.Repo.clone_from(url, dest, depth=1)
+    _git("clone", "--depth=1", "--filter=blob:none", "--single-branch", "--no-checkout", "--", url, dest)
+    try:
+        _git("sparse-checkout", "set", "--no-cone", *_sparse_patterns(), cwd=dest)
+    except RuntimeError as e:
+        # Older git without non-cone sparse-checkout: fall back to a full checkout
+        logger.warning("Sparse checkout unavailable, checking out everything: %s", e)
+    _git("checkout", cwd=dest)
     logger.info("Clone complete → %s", dest)
     return dest
 
 
-def extract_zip(file_bytes: bytes, original_filename: str) -> str:
-    """Extract an uploaded ZIP file and return the extraction path."""
+def extract_zip_path(zip_path: str, original_filename: str) -> str:
+    """Extract a ZIP file already on disk and return the extraction path."""
     repo_id = str(uuid.uuid4())[:8]
     dest = os.path.join(settings.REPOS_DIR, repo_id)
     os.makedirs(dest, exist_ok=True)
 
-    logger.info("Extracting ZIP '%s' (%d bytes) → %s", original_filename, len(file_bytes), dest)
-
-    zip_path = os.path.join(dest, "upload.zip")
-    with open(zip_path, "wb") as f:
-        f.write(file_bytes)
+    logger.info("Extracting ZIP '%s' (%d bytes) → %s", original_filename, os.path.getsize(zip_path), dest)
 
     with zipfile.ZipFile(zip_path, "r") as z:
         z.extractall(dest)
 
-    os.remove(zip_path)
+    return _zip_root(dest)
 
-    # If ZIP contained a single root folder, use that as the repo root
+
+def _zip_root(dest: str) -> str:
+    """If the extracted ZIP contained a single root folder, use that as the repo root."""
     entries = [e for e in os.listdir(dest) if not e.startswith(".")]
     if len(entries) == 1 and os.path.isdir(os.path.join(dest, entries[0])):
         final_path = os.path.join(dest, entries[0])
@@ -84,20 +119,136 @@ def extract_zip(file_bytes: bytes, original_filename: str) -> str:
 
 def _should_ignore_dir(dirname: str) -> bool:
     """Check if a directory should be skipped."""
-    return dirname in settings.IGNORED_DIRS or dirname.startswith(".")
+    return dirname in settings.IGNORED_DIRS_SET or dirname.startswith(".")
+
+
+def _extension(name: str) -> str:
+    """Lowercased extension of a file name; same result as os.path.splitext, but cheaper."""
+    dot = name.rfind(".")
+    # Leading dots don't start an extension (".bashrc" has none)
+    return name[dot:].lower() if dot > 0 and name[:dot].lstrip(".") else ""
+
+
+# KEY=value assignment lines in .env files. Mirrors the old per-line check:
+# after leading whitespace, a line that isn't a comment and contains "=".
+# Horizontal whitespace only, so a match never spans lines.
+_ENV_ASSIGN_RE = re.compile(r"^[^\S\n]*(?P<key>[^\s#=][^=\n]*)?=.*$", re.MULTILINE)
 
 
 def _mask_env_content(content: str) -> str:
     """Mask sensitive values in .env files."""
-    masked_lines = []
-    for line in content.splitlines():
-        stripped = line.strip()
-        if stripped and not stripped.startswith("#") and "=" in stripped:
-            key = stripped.split("=", 1)[0]
-            masked_lines.append(f"{key}=***MASKED***")
-        else:
-            masked_lines.append(line)
-    return "\n".join(masked_lines)
+    return _ENV_ASSIGN_RE.sub(r"\g<key>=***MASKED***", content)
+
+
+def _walk(path: str):
+    """
+    Yield a DirEntry for every file under path, top-down in the same order as
+    os.walk (a directory's files before its subdirectories). Ignored dirs are
+    pruned and, like os.walk, symlinked dirs are listed but not descended.
+    """
+    files: list[os.DirEntry] = []
+    subdirs: list[str] = []
+    pruned: list[str] = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files.append(entry)
+                elif _should_ignore_dir(entry.name):
+                    pruned.append(entry.name)
+                elif not entry.is_symlink():
+                    subdirs.append(entry.path)
+    except OSError:
+        return
+
+    if pruned:
+        logger.debug("Pruning ignored dirs: %s in %s", pruned, path)
+    yield from files
+    for subdir in subdirs:
+        yield from _walk(subdir)
+
+
+# Bytes that plausibly occur in text: printable ASCII, common control
+# characters (\a \b \t \n \f \r ESC), and everything >= 0x80 (UTF-8)
+_TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+_SNIFF_BYTES = 8192
+
+
+def _looks_binary(head: bytes) -> bool:
+    """True if a file's leading bytes contain NUL or are >30% non-text."""
+    if b"\0" in head:
+        return True
+    return len(head.translate(None, _TEXT_BYTES)) > 0.3 * len(head)
+
+
+def _read_text(path: str, size: int) -> str | None:
+    """
+    Read a file with os.read and decode it like text-mode open().
+    Returns None for binary files, judged from the first 8KB before the
+    rest is read.
+    """
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        data = os.read(fd, min(size, _SNIFF_BYTES))
+        if _looks_binary(data):
+            return None
+        if size > len(data):
+            data += os.read(fd, size - len(data))
+    finally:
+        os.close(fd)
+    content = data.decode("utf-8", "ignore")
+    # Universal newlines, as open(..., "r") would have applied
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
+
+
+def _read_one(candidate: tuple[os.DirEntry, str, str]) -> FileInfo | None:
+    """Read one (entry, relative_path, language) candidate, or None to skip it."""
+    entry, relative_path, language = candidate
+    filepath = entry.path
+
+    # .env files are read regardless of size and masked
+    if language == "env":
+        try:
+            content = _read_text(filepath, entry.stat().st_size)
+        except Exception:
+            return None
+        if content is None:
+            return None
+        logger.debug("Masked .env file: %s", filepath)
+        return FileInfo(
+            path=filepath,
+            relative_path=relative_path,
+            language="env",
+            content=_mask_env_content(content),
+        )
+
+    try:
+        # Skip very large files (> 500KB) before reading them
+        size = entry.stat().st_size
+        if size > 500_000:
+            logger.warning("Skipping large file (%d bytes): %s", size, filepath)
+            return None
+
+        content = _read_text(filepath, size)
+        if content is None:
+            logger.debug("Skipping binary file: %s", filepath)
+            return None
+
+        return FileInfo(
+            path=filepath,
+            relative_path=relative_path,
+            language=language,
+            content=content,
+        )
+    except Exception as e:
+        logger.warning("Failed to read %s: %s", filepath, e)
+        return None
 
 
 def filter_files(repo_path: str) -> list[FileInfo]:
@@ -105,61 +256,31 @@ def filter_files(repo_path: str) -> list[FileInfo]:
     Walk the repo directory and return a list of FileInfo for allowed files.
     Ignores specified directories, filters by extension, masks .env files.
     """
-    files: list[FileInfo] = []
     repo_path = os.path.abspath(repo_path)
+    prefix_len = len(os.path.join(repo_path, ""))
+    candidates: list[tuple[os.DirEntry, str, str]] = []
     skipped = 0
 
-    for root, dirs, filenames in os.walk(repo_path):
-        # Prune ignored directories in-place
-        pruned = [d for d in dirs if _should_ignore_dir(d)]
-        if pruned:
-            logger.debug("Pruning ignored dirs: %s in %s", pruned, root)
-        dirs[:] = [d for d in dirs if not _should_ignore_dir(d)]
+    for entry in _walk(repo_path):
+        filename = entry.name
+        relative_path = entry.path[prefix_len:].replace("\\", "/")
 
-        for filename in filenames:
-            filepath = os.path.join(root, filename)
-            ext = os.path.splitext(filename)[1].lower()
+        # Allow .env files (will be masked)
+        if filename == ".env" or filename.startswith(".env."):
+            candidates.append((entry, relative_path, "env"))
+            continue
 
-            # Allow .env files (will be masked)
-            if filename == ".env" or filename.startswith(".env."):
-                try:
-                    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read()
-                    files.append(FileInfo(
-                        path=filepath,
-                        relative_path=os.path.relpath(filepath, repo_path).replace("\\", "/"),
-                        language="env",
-                        content=_mask_env_content(content),
-                    ))
-                    logger.debug("Masked .env file: %s", filepath)
-                except Exception:
-                    pass
-                continue
-
-            if ext not in settings.ALLOWED_EXTENSIONS:
-                skipped += 1
-                continue
-
-            language = EXTENSION_LANGUAGE_MAP.get(ext, "unknown")
-
-            try:
-                with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
-
-                # Skip very large files (> 500KB)
-                if len(content) > 500_000:
-                    logger.warning("Skipping large file (%d bytes): %s", len(content), filepath)
-                    continue
+        ext = _extension(filename)
+        if ext not in settings.ALLOWED_EXTENSIONS_SET:
+            skipped += 1
+            continue
+
+        candidates.append((entry, relative_path, EXTENSION_LANGUAGE_MAP.get(ext, "unknown")))
 
-                files.append(FileInfo(
-                    path=filepath,
-                    relative_path=os.path.relpath(filepath, repo_path).replace("\\", "/"),
-                    language=language,
-                    content=content,
-                ))
-            except Exception as e:
-                logger.warning("Failed to read %s: %s", filepath, e)
-                continue
+    # Reads are syscall-bound and release the GIL, so overlap them on threads.
+    # map() yields in submission order, keeping the result deterministic.
+    with ThreadPoolExecutor(max_workers=_READ_WORKERS) as pool:
+        files = [f for f in pool.map(_read_one, candidates) if f is not None]
 
     logger.info("Filtered %d source files (%d skipped by extension)", len(files), skipped)
     return files
@@ -168,31 +289,32 @@ def filter_files(repo_path: str) -> list[FileInfo]:
 def get_file_tree(repo_path: str) -> dict:
     """Build a nested file tree structure for the frontend."""
     repo_path = os.path.abspath(repo_path)
+    prefix_len = len(os.path.join(repo_path, ""))
     tree: dict = {"name": os.path.basename(repo_path), "type": "directory", "children": []}
 
     def _build(current_path: str, node: dict):
         try:
-            entries = sorted(os.listdir(current_path))
+            with os.scandir(current_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
         except PermissionError:
             return
 
         for entry in entries:
-            full_path = os.path.join(current_path, entry)
+            name = entry.name
 
-            if os.path.isdir(full_path):
-                if _should_ignore_dir(entry):
+            if entry.is_dir():
+                if _should_ignore_dir(name):
                     continue
-                child = {"name": entry, "type": "directory", "children": []}
-                _build(full_path, child)
+                child = {"name": name, "type": "directory", "children": []}
+                _build(entry.path, child)
                 node["children"].append(child)
             else:
-                ext = os.path.splitext(entry)[1].lower()
-                if ext in settings.ALLOWED_EXTENSIONS or entry.startswith(".env"):
-                    rel = os.path.relpath(full_path, repo_path).replace("\\", "/")
+                ext = _extension(name)
+                if ext in settings.ALLOWED_EXTENSIONS_SET or name.startswith(".env"):
                     node["children"].append({
-                        "name": entry,
+                        "name": name,
                         "type": "file",
-                        "path": rel,
+                        "path": entry.path[prefix_len:].replace("\\", "/"),
                         "language": EXTENSION_LANGUAGE_MAP.get(ext, "unknown"),
                     })
 
@@ -10,7 +10,7 @@ from app.config import settings
 logger = logging.getLogger("codecontext.retrieval")
 
 
-@dataclass
+@dataclass(slots=True)
 class RetrievedChunk:
     """A chunk retrieved from the vector store with relevance info."""
     file_path: str
@@ -41,17 +41,17 @@ def retrieve(
     query_emb = embed_query(question)
     results = query_chunks(project_id, query_emb, top_k=top_k)
 
-    chunks: list[RetrievedChunk] = []
+    ids = results["ids"][0] if results["ids"] else []
+    if not ids:
+        return []
 
-    if not results["ids"] or not results["ids"][0]:
-        return chunks
+    n = len(ids)
+    metas = results["metadatas"][0] or [{}] * n
+    docs = results["documents"][0] or [""] * n
+    dists = results["distances"][0] or [1.0] * n
 
-    for i, doc_id in enumerate(results["ids"][0]):
-        meta = results["metadatas"][0][i] if results["metadatas"][0] else {}
-        code = results["documents"][0][i] if results["documents"][0] else ""
-        distance = results["distances"][0][i] if results["distances"][0] else 1.0
-
-        chunks.append(RetrievedChunk(
+    chunks = [
+        RetrievedChunk(
             file_path=meta.get("file_path", "unknown"),
             symbol=meta.get("symbol", "unknown"),
             code=code,
@@ -59,7 +59,9 @@ def retrieve(
             distance=distance,
             start_line=meta.get("start_line"),
             end_line=meta.get("end_line"),
-        ))
+        )
+        for meta, code, distance in zip(metas, docs, dists)
+    ]
 
     logger.info("Retrieved %d chunks for project %d", len(chunks), project_id)
     return chunks
@@ -70,16 +72,16 @@ def build_context_prompt(chunks: list[RetrievedChunk]) -> str:
     if not chunks:
         return "No relevant code found in the repository."
 
-    sections: list[str] = []
+    parts: list[str] = []
     for i, chunk in enumerate(chunks, 1):
-        location = chunk.file_path
+        if i > 1:
+            parts.append("\n\n")
+        parts.append(f"--- [{i}] {chunk.file_path}")
         if chunk.start_line:
-            location += f" (lines {chunk.start_line}-{chunk.end_line})"
+            parts.append(f" (lines {chunk.start_line}-{chunk.end_line})")
         if chunk.symbol and chunk.symbol not in ("<file>", "<module>", "<imports>"):
-            location += f" → {chunk.symbol}"
-
-        sections.append(
-            f"--- [{i}] {location} ({chunk.language}) ---\n{chunk.code}"
-        )
+            parts.append(f" → {chunk.symbol}")
+        parts.append(f" ({chunk.language}) ---\n")
+        parts.append(chunk.code)
 
-    return "\n\n".join(sections)
+    return "".join(parts)
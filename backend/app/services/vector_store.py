@@ -1,84 +1,281 @@
 """
 Pure-Python vector store using NumPy cosine similarity.
 No C++ build tools required — works out of the box on Windows.
-Data is persisted to JSON files on disk, one per project.
+Each project is persisted to disk as a JSON file (ids, documents, metadatas)
+plus an append-only .emb.f16 file of raw float16 unit-vector rows.
 """
 
-import json
+import importlib
 import logging
 import os
+import threading
 import numpy as np
+import orjson
+from functools import cache, lru_cache
+from operator import itemgetter
 from pathlib import Path
 
 from app.config import settings
 
 logger = logging.getLogger("codecontext.vectors")
 
-# In-memory cache of loaded collections
+# In-memory cache of loaded collections. Keys starting with "_" are not
+# written to the JSON file: "_emb" is a (buffer, rows) pair whose first
+# `rows` rows are the embeddings as unit-length float32 vectors, so queries
+# are a single matmul, and "_persisted_rows" counts how many of those rows
+# are already in the .emb.f16 file. The buffer grows geometrically, so
+# appends don't copy the whole matrix each time. "_ann" holds the
+# approximate index once one has been built (see _ann_index), and
+# "_device_emb" a copy of the rows on VECTOR_STORE_DEVICE (see _device_matrix).
 _collections: dict[int, dict] = {}
 
+# Projects with changes not yet written to disk (see flush)
+_dirty: set[int] = set()
+
+# Per-project locks serializing writers (load, add, flush, delete, index
+# use). Exact queries don't take them: they read one "_emb" tuple, and
+# add_chunks extends the chunk lists before publishing the new tuple, so
+# every row a snapshot covers already has its id, document and metadata.
+_locks: dict[int, threading.RLock] = {}
+_locks_guard = threading.Lock()
+
+# Approximate indexes fetch this many candidates per requested result,
+# then re-score them exactly against the float rows
+_ANN_RERANK = 4
+
+# HNSW candidate list size while building (links per node and the search
+# list size are VECTOR_INDEX_HNSW_M / VECTOR_INDEX_HNSW_EF)
+_HNSW_EF_CONSTRUCTION = 200
+
+# Product quantization: at most this many one-byte codes per row (the
+# largest divisor of the dimension is used)
+_PQ_SUBVECTORS = 96
+_PQ_BITS = 8
+
+# Below this many rows, a CPU scan beats the round trip to a GPU
+_DEVICE_MIN_ROWS = 20000
+
 
 def _collection_path(project_id: int) -> str:
     """Get the file path for a project's vector collection."""
     return os.path.join(settings.CHROMA_PERSIST_DIR, f"project_{project_id}.json")
 
 
+def _embeddings_path(project_id: int) -> str:
+    """Get the file path for a project's append-only embedding rows."""
+    return os.path.join(settings.CHROMA_PERSIST_DIR, f"project_{project_id}.emb.f16")
+
+
+def _ann_path(project_id: int, kind: str) -> str:
+    """Get the file path for a project's approximate index of the given kind."""
+    return os.path.join(settings.CHROMA_PERSIST_DIR, f"project_{project_id}.{kind}")
+
+
+def _project_lock(project_id: int) -> threading.RLock:
+    """Get (or create) the lock for a project."""
+    lock = _locks.get(project_id)
+    if lock is None:
+        with _locks_guard:
+            lock = _locks.setdefault(project_id, threading.RLock())
+    return lock
+
+
 def _load_collection(project_id: int) -> dict:
-    """Load a collection from disk, or return empty one."""
-    if project_id in _collections:
-        return _collections[project_id]
+    """Load a collection from disk (once, even for concurrent callers), or return empty one."""
+    collection = _collections.get(project_id)
+    if collection is not None:
+        return collection
+    with _project_lock(project_id):
+        collection = _collections.get(project_id)
+        if collection is None:
+            collection = _read_collection(project_id)
+        return collection
 
-    path = _collection_path(project_id)
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+
+def _read_collection(project_id: int) -> dict:
+    """Read a collection from disk into the cache, or cache an empty one."""
+    try:
+        with open(_collection_path(project_id), "rb") as f:
+            data = orjson.loads(f.read())
+    except FileNotFoundError:
+        empty = {"ids": [], "documents": [], "metadatas": [], "_emb": (None, 0), "_persisted_rows": 0}
+        _collections[project_id] = empty
+        return empty
+
+    # Older layout: raw floats inline in the JSON
+    legacy = data.pop("embeddings", None)
+    if legacy is not None:
+        normed = _to_unit_rows(np.asarray(legacy, dtype=np.float32))
+        data["_emb"] = (normed, 0 if normed is None else len(normed))
+        data["_persisted_rows"] = 0
         _collections[project_id] = data
+        _save_collection(project_id)
+        logger.info("Migrated project %d embeddings to %s", project_id, _embeddings_path(project_id))
         return data
 
-    empty = {"ids": [], "documents": [], "embeddings": [], "metadatas": []}
-    _collections[project_id] = empty
-    return empty
+    normed = _read_embeddings(project_id, data)
+    rows = 0 if normed is None else len(normed)
+    data["_emb"] = (normed, rows)
+    data["_persisted_rows"] = rows
+    _collections[project_id] = data
+    return data
+
+
+def _read_embeddings(project_id: int, data: dict) -> np.ndarray | None:
+    """
+    Read the .emb.f16 rows for a loaded collection as float32. Rows and
+    chunks are trimmed to the shorter of the two, e.g. rows appended by a
+    save that died before its JSON was written.
+
+    The file is memory-mapped and upcast straight into the float32 matrix,
+    so no float16 copy of the whole file is held alongside it.
+    """
+    emb_path = _embeddings_path(project_id)
+    dim = data.get("dim")
+    if not dim:
+        return None
+    try:
+        size = os.path.getsize(emb_path)
+    except FileNotFoundError:
+        return None
+
+    row_bytes = dim * np.dtype(np.float16).itemsize
+    n = min(size // row_bytes, len(data["ids"]))
+    if n != len(data["ids"]) or n * row_bytes != size:
+        logger.warning(
+            "Project %d has %d embeddings for %d chunks; keeping the first %d",
+            project_id, size // row_bytes, len(data["ids"]), n,
+        )
+        for key in ("ids", "documents", "metadatas"):
+            del data[key][n:]
+        # Later saves append after the kept rows
+        os.truncate(emb_path, n * row_bytes)
+    if n == 0:
+        return None
+    rows = np.memmap(emb_path, dtype=np.float16, mode="r", shape=(n, dim))
+    matrix = np.array(rows, dtype=np.float32, order="C")
+    del rows  # unmap now rather than at garbage collection
+    return matrix
+
+
+def _to_unit_rows(vectors: np.ndarray) -> np.ndarray | None:
+    """
+    Scale each row to unit length, as a C-contiguous float32 matrix.
+    Values are rounded to float16 precision, matching what the .emb.f16
+    file stores, so results are the same before and after a reload.
+    """
+    if vectors.size == 0:
+        return None
+    # One owned copy, normalized and rounded in place from here on
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2, order="C")
+    norms = np.sqrt(np.einsum("ij,ij->i", vectors, vectors))
+    norms += 1e-10
+    vectors /= norms[:, None]
+    vectors[...] = vectors.astype(np.float16)
+    return vectors
 
 
 def _save_collection(project_id: int) -> None:
-    """Persist a collection to disk."""
+    """
+    Persist a collection to disk. Only embedding rows added since the last
+    save are written, appended to the .emb.f16 file; the JSON is rewritten.
+    """
     path = _collection_path(project_id)
     os.makedirs(os.path.dirname(path), exist_ok=True)
     logger.debug("Saving collection for project %d → %s", project_id, path)
     data = _collections.get(project_id, {})
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f)
+    meta = {k: v for k, v in data.items() if not k.startswith("_")}
+
+    buffer, rows = data.get("_emb", (None, 0))
+    if buffer is not None:
+        meta["dim"] = buffer.shape[1]
+        persisted = data["_persisted_rows"]
+        if persisted < rows:
+            # float16 halves the file; stored values are unit-length, well within range
+            with open(_embeddings_path(project_id), "ab" if persisted else "wb") as f:
+                buffer[persisted:rows].astype(np.float16).tofile(f)
+            data["_persisted_rows"] = rows
+
+    index = data.get("_ann")
+    if index is not None:
+        index.save(_ann_path(project_id, index.kind))
+
+    # Written after the rows, so a crash in between leaves only extra rows,
+    # which _read_embeddings trims
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(meta))
 
 
 def add_chunks(
     project_id: int,
     ids: list[str],
     documents: list[str],
-    embeddings: list[list[float]],
+    embeddings: np.ndarray | list[list[float]],
     metadatas: list[dict],
 ) -> None:
     """
-    Store code chunks with their embeddings.
+    Store code chunks with their embeddings. Changes stay in memory until
+    flush(project_id) writes them, so bulk ingestion saves once.
 
     Args:
         project_id: The project these chunks belong to.
         ids: Unique IDs for each chunk.
         documents: The raw code text for each chunk.
-        embeddings: Pre-computed embedding vectors.
+        embeddings: Pre-computed embedding vectors (ndarray or nested list).
         metadatas: Metadata dicts (file_path, symbol, language, etc.).
     """
     collection = _load_collection(project_id)
     logger.info("Adding %d chunks to project %d vector store", len(ids), project_id)
-    collection["ids"].extend(ids)
-    collection["documents"].extend(documents)
-    collection["embeddings"].extend(embeddings)
-    collection["metadatas"].extend(metadatas)
-    _save_collection(project_id)
+
+    # Only the new rows need normalizing; stored rows never change
+    new_normed = _to_unit_rows(np.asarray(embeddings, dtype=np.float32))
+    with _project_lock(project_id):
+        collection["ids"].extend(ids)
+        collection["documents"].extend(documents)
+        collection["metadatas"].extend(metadatas)
+        if new_normed is not None:
+            _append_rows(collection, new_normed)
+            index = collection.get("_ann")
+            if index is not None:
+                index.add(new_normed)
+        _dirty.add(project_id)
+
+
+def _append_rows(collection: dict, new_rows: np.ndarray) -> None:
+    """
+    Copy rows into the collection's embedding buffer, doubling it when full.
+    Rows are written past the published length (or into a new buffer), then
+    published as a new (buffer, rows) tuple, so readers never see them torn.
+    """
+    buffer, rows = collection["_emb"]
+    end = rows + len(new_rows)
+    if buffer is None:
+        buffer = np.empty((len(new_rows), new_rows.shape[1]), dtype=np.float32)
+    elif end > len(buffer):
+        grown = np.empty((max(2 * len(buffer), end), buffer.shape[1]), dtype=np.float32)
+        grown[:rows] = buffer[:rows]
+        buffer = grown
+    buffer[rows:end] = new_rows
+    collection["_emb"] = (buffer, end)
+
+
+def flush(project_id: int) -> None:
+    """Write a project's pending changes to disk, if it has any."""
+    with _project_lock(project_id):
+        if project_id in _dirty:
+            _save_collection(project_id)
+            _dirty.discard(project_id)
+
+
+def flush_all() -> None:
+    """Write every project's pending changes to disk."""
+    for project_id in list(_dirty):
+        flush(project_id)
 
 
 def query_chunks(
     project_id: int,
-    query_embedding: list[float],
+    query_embedding: np.ndarray | list[float],
     top_k: int = 20,
 ) -> dict:
     """
@@ -89,30 +286,55 @@ def query_chunks(
     """
     collection = _load_collection(project_id)
 
-    if not collection["embeddings"]:
+    # One consistent snapshot; add_chunks publishes a new tuple, never
+    # changes rows this one covers
+    buffer, rows = collection["_emb"]
+    if not rows:
         return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
 
-    # Compute cosine similarity
-    query_vec = np.array(query_embedding, dtype=np.float32)
-    stored_vecs = np.array(collection["embeddings"], dtype=np.float32)
-
-    # Normalize
-    query_norm = query_vec / (np.linalg.norm(query_vec) + 1e-10)
-    stored_norms = stored_vecs / (np.linalg.norm(stored_vecs, axis=1, keepdims=True) + 1e-10)
-
-    # Cosine similarity (higher is better)
-    similarities = stored_norms @ query_norm
+    # Cosine similarity (higher is better): stored rows are already unit
+    # length, so only the query needs normalizing
+    query_vec = np.asarray(query_embedding, dtype=np.float32).ravel()
+    query_norm = query_vec / (np.sqrt(np.vdot(query_vec, query_vec)) + 1e-10)
 
     # Get top-K indices (highest similarity first)
-    k = min(top_k, len(similarities))
-    top_indices = np.argsort(similarities)[::-1][:k]
-    logger.debug("Query returned top-%d results for project %d (best similarity: %.3f)", k, project_id, similarities[top_indices[0]])
+    k = min(top_k, rows)
+    index = _ann_index(project_id, collection)
+    device_matrix = _device_matrix(project_id, collection) if index is None else None
+    kernel = None
+    if index is None and device_matrix is None and settings.VECTOR_SEARCH_KERNEL == "numba":
+        kernel = _numba_topk(buffer.shape[1])
+    if index is not None:
+        # The index libraries can't search while add_chunks extends them
+        with _project_lock(project_id):
+            buffer, rows = collection["_emb"]
+            top_indices, top_sims = index.search(buffer[:rows], query_norm, k)
+    elif device_matrix is not None:
+        top_indices, top_sims = _device_topk(device_matrix, collection["_emb"][0], query_norm, k)
+    elif kernel is not None:
+        top_indices, top_sims = kernel(buffer[:rows], query_norm, k)
+    else:
+        # Row-major float32 (N, D) times a contiguous (D,) vector: np.dot hands
+        # this to BLAS sgemv as a single call, with no layout copies
+        neg_sims = np.dot(buffer[:rows], query_norm)
+        # Negated in place (no second (N,) array) so the smallest come first;
+        # argpartition selects the top k in O(N), and only those k get sorted
+        np.negative(neg_sims, out=neg_sims)
+        top_indices = np.argpartition(neg_sims, k - 1)[:k]
+        top_indices = top_indices[np.argsort(neg_sims[top_indices], kind="stable")]
+        top_sims = -neg_sims[top_indices]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Query returned top-%d results for project %d (best similarity: %.3f)", k, project_id, top_sims[0])
 
-    # Build result (use 1 - similarity as "distance" for compatibility)
-    result_ids = [collection["ids"][i] for i in top_indices]
-    result_docs = [collection["documents"][i] for i in top_indices]
-    result_metas = [collection["metadatas"][i] for i in top_indices]
-    result_distances = [float(1.0 - similarities[i]) for i in top_indices]
+    # Build result (use 1 - similarity as "distance" for compatibility).
+    # itemgetter fetches all k entries in one call, but returns a bare
+    # item rather than a tuple when k == 1
+    top = top_indices.tolist()
+    pick = itemgetter(*top) if len(top) > 1 else lambda seq: (seq[top[0]],)
+    result_ids = list(pick(collection["ids"]))
+    result_docs = list(pick(collection["documents"]))
+    result_metas = list(pick(collection["metadatas"]))
+    result_distances = (1.0 - top_sims).tolist()
 
     return {
         "ids": [result_ids],
@@ -122,10 +344,282 @@ def query_chunks(
     }
 
 
+@lru_cache(maxsize=8)
+def _numba_topk(dim: int):
+    """
+    Compile the fused numba search kernel for `dim`-dimensional rows, or
+    return None if numba isn't installed. The kernel computes dot products
+    and keeps a running top-k per block of rows in one pass (blocks run in
+    parallel), so the (N,) similarity vector is never materialized. `dim` is
+    a compile-time constant in the kernel, so LLVM knows the inner loop's
+    trip count and can unroll and vectorize it fully. Compiled code is
+    cached on disk.
+    """
+    numba = _optional_module("numba", "the NumPy search kernel")
+    if numba is None:
+        return None
+    prange = numba.prange
+
+    @numba.njit(cache=True, fastmath=True, parallel=True)
+    def topk_cosine(matrix, query, k):
+        n = matrix.shape[0]
+        n_blocks = min(max(n // 4096, 1), 64)
+        block = (n + n_blocks - 1) // n_blocks
+        # Finite sentinel below any cosine score: fastmath assumes no infinities
+        sims = np.full((n_blocks, k), -2.0, dtype=np.float32)
+        idxs = np.full((n_blocks, k), -1, dtype=np.int64)
+        for b in prange(n_blocks):
+            vals = sims[b]
+            ids = idxs[b]
+            for i in range(b * block, min(n, (b + 1) * block)):
+                s = np.float32(0.0)
+                for j in range(dim):
+                    s += matrix[i, j] * query[j]
+                if s > vals[k - 1]:
+                    # Insert into this block's descending top-k list
+                    pos = k - 1
+                    while pos > 0 and vals[pos - 1] < s:
+                        vals[pos] = vals[pos - 1]
+                        ids[pos] = ids[pos - 1]
+                        pos -= 1
+                    vals[pos] = s
+                    ids[pos] = i
+        # Merge the per-block lists; a stable sort keeps lower row indices first on ties
+        flat_sims = sims.ravel()
+        flat_idxs = idxs.ravel()
+        order = np.argsort(-flat_sims, kind="mergesort")[:k]
+        order = order[flat_idxs[order] >= 0]
+        return flat_idxs[order], flat_sims[order]
+
+    return topk_cosine
+
+
+def _device_matrix(project_id: int, collection: dict):
+    """
+    Return the collection's rows as a float16 tensor on VECTOR_STORE_DEVICE,
+    uploading any rows added since the last call, or None to search on the
+    CPU: the device is "cpu", the collection is below _DEVICE_MIN_ROWS, or
+    torch / the device isn't available.
+    """
+    device = settings.VECTOR_STORE_DEVICE
+    if device == "cpu" or collection["_emb"][1] < _DEVICE_MIN_ROWS:
+        return None
+    torch = _torch_for_device(device)
+    if torch is None:
+        return None
+
+    with _project_lock(project_id):
+        buffer, rows = collection["_emb"]
+        matrix, uploaded = collection.get("_device_emb", (None, 0))
+        if uploaded < rows:
+            # Stored rows are already rounded to float16, so this is lossless
+            new = torch.from_numpy(buffer[uploaded:rows]).to(device, torch.float16)
+            matrix = new if matrix is None else torch.cat((matrix, new))
+            collection["_device_emb"] = (matrix, rows)
+        return matrix
+
+
+def _device_topk(matrix, buffer: np.ndarray, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Matmul and top-k on the device; only the k winners come back, and are
+    re-scored on the CPU in float32 so distances match the other paths.
+    """
+    torch = _optional_module("torch")
+    q = torch.from_numpy(query).to(matrix.device, torch.float16)
+    top_indices = torch.topk(matrix @ q, k).indices.cpu().numpy()
+    top_sims = buffer[top_indices] @ query
+    order = np.argsort(-top_sims, kind="stable")
+    return top_indices[order], top_sims[order]
+
+
+@cache
+def _torch_for_device(device: str):
+    """Import torch and check that `device` is usable, or return None (with a warning)."""
+    torch = _optional_module("torch", "CPU vector search")
+    if torch is None:
+        return None
+    try:
+        torch.empty(0, device=device)
+    except (RuntimeError, AssertionError) as e:
+        logger.warning("Vector store device %r is unavailable (%s); using CPU vector search", device, e)
+        return None
+    return torch
+
+
+class _HnswIndex:
+    """
+    HNSW graph (hnswlib) over the unit rows; labels are row numbers. The
+    best candidates are re-scored against the float rows, so returned
+    similarities are exact.
+    """
+
+    kind = "hnsw"
+    module = "hnswlib"
+    min_rows = 1
+
+    def __init__(self, hnswlib, index):
+        self.hnswlib = hnswlib
+        self.index = index
+
+    @classmethod
+    def build(cls, hnswlib, matrix: np.ndarray) -> "_HnswIndex":
+        index = hnswlib.Index(space="ip", dim=matrix.shape[1])
+        index.init_index(
+            max_elements=len(matrix), ef_construction=_HNSW_EF_CONSTRUCTION, M=settings.VECTOR_INDEX_HNSW_M,
+        )
+        return cls(hnswlib, index)
+
+    @classmethod
+    def load(cls, hnswlib, path: str, dim: int, capacity: int) -> "_HnswIndex":
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.load_index(path, max_elements=capacity)
+        return cls(hnswlib, index)
+
+    def __len__(self) -> int:
+        return self.index.get_current_count()
+
+    def add(self, rows: np.ndarray) -> None:
+        start = len(self)
+        end = start + len(rows)
+        if self.index.get_max_elements() < end:
+            self.index.resize_index(max(2 * self.index.get_max_elements(), end))
+        self.index.add_items(rows, np.arange(start, end))
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        fetch = min(k * _ANN_RERANK, len(self))
+        self.index.set_ef(max(settings.VECTOR_INDEX_HNSW_EF, fetch))
+        labels, _ = self.index.knn_query(query, k=fetch)
+        return _rerank(matrix, labels[0], query, k)
+
+    def save(self, path: str) -> None:
+        self.index.save_index(path)
+
+
+class _PQIndex:
+    """
+    faiss product quantizer: each row is stored as one-byte codes and
+    scanned with per-query lookup tables instead of multiplies. The best
+    candidates are re-scored against the float rows, so returned
+    similarities are exact.
+    """
+
+    kind = "pq"
+    module = "faiss"
+    # faiss wants ~39 training rows per centroid
+    min_rows = 39 * (1 << _PQ_BITS)
+
+    def __init__(self, faiss, index):
+        self.faiss = faiss
+        self.index = index
+
+    @classmethod
+    def build(cls, faiss, matrix: np.ndarray) -> "_PQIndex":
+        dim = matrix.shape[1]
+        subvectors = max(m for m in range(1, _PQ_SUBVECTORS + 1) if dim % m == 0)
+        index = faiss.IndexPQ(dim, subvectors, _PQ_BITS, faiss.METRIC_INNER_PRODUCT)
+        index.train(matrix)
+        return cls(faiss, index)
+
+    @classmethod
+    def load(cls, faiss, path: str, dim: int, capacity: int) -> "_PQIndex":
+        return cls(faiss, faiss.read_index(path))
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    def add(self, rows: np.ndarray) -> None:
+        self.index.add(rows)
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        _, labels = self.index.search(query[None, :], min(k * _ANN_RERANK, len(self)))
+        return _rerank(matrix, labels[0][labels[0] >= 0], query, k)
+
+    def save(self, path: str) -> None:
+        self.faiss.write_index(self.index, path)
+
+
+def _rerank(matrix: np.ndarray, labels: np.ndarray, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Score candidate rows exactly and keep the best k, highest first."""
+    sims = matrix[labels] @ query
+    order = np.argsort(-sims, kind="stable")[:k]
+    return labels[order], sims[order]
+
+
+# VECTOR_INDEX values → index types
+_ANN_INDEXES = {"hnsw": _HnswIndex, "pq": _PQIndex}
+
+
+def _ann_index(project_id: int, collection: dict):
+    """
+    Return the collection's approximate index, or None to search exactly:
+    when VECTOR_INDEX is "exact", the collection is too small to need (or
+    train) an index, or the index library isn't installed. The index is
+    loaded from disk (topped up with any rows it is missing) or built on
+    first use, then kept current by add_chunks. Labels are row numbers in
+    the embedding buffer.
+    """
+    index_type = _ANN_INDEXES.get(settings.VECTOR_INDEX)
+    if index_type is None:
+        return None
+    index = collection.get("_ann")
+    if index is not None or collection["_emb"][1] < max(settings.VECTOR_INDEX_MIN_ROWS, index_type.min_rows):
+        return index
+    lib = _optional_module(index_type.module)
+    if lib is None:
+        return None
+
+    with _project_lock(project_id):
+        index = collection.get("_ann")
+        if index is not None:
+            return index
+        buffer, rows = collection["_emb"]
+        path = _ann_path(project_id, index_type.kind)
+        try:
+            index = index_type.load(lib, path, buffer.shape[1], rows)
+        except (OSError, RuntimeError):
+            # No saved index (hnswlib and faiss raise RuntimeError for a
+            # missing file), or an unreadable one: build it afresh
+            index = None
+        if index is not None and len(index) > rows:
+            # Rows were trimmed on load; the saved index points past them
+            index = None
+        if index is None:
+            index = index_type.build(lib, buffer[:rows])
+        if len(index) < rows:
+            logger.info("Indexing %d embeddings for project %d (%s)", rows - len(index), project_id, index_type.kind)
+            index.add(buffer[len(index):rows])
+            index.save(path)
+        logger.info(
+            "Project %d has %d embeddings; searching it approximately (%s) from now on",
+            project_id, rows, index_type.kind,
+        )
+        collection["_ann"] = index
+        return index
+
+
+@cache
+def _optional_module(name: str, fallback: str = "exact vector search"):
+    """Import an optional library, or return None (with a warning) if it isn't installed."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        logger.warning("%s is not installed; using %s", name, fallback)
+        return None
+
+
 def delete_collection(project_id: int) -> None:
     """Delete a project's entire vector collection."""
-    path = _collection_path(project_id)
-    if os.path.exists(path):
-        os.remove(path)
-        logger.info("Deleted vector collection for project %d", project_id)
-    _collections.pop(project_id, None)
+    with _project_lock(project_id):
+        try:
+            os.remove(_collection_path(project_id))
+            logger.info("Deleted vector collection for project %d", project_id)
+        except FileNotFoundError:
+            pass
+        sidecars = [_embeddings_path(project_id)] + [_ann_path(project_id, kind) for kind in _ANN_INDEXES]
+        for sidecar in sidecars:
+            try:
+                os.remove(sidecar)
+            except FileNotFoundError:
+                pass
+        _collections.pop(project_id, None)
+        _dirty.discard(project_id)